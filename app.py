@@ -2,9 +2,12 @@ import streamlit as st
 import calendar
 from datetime import datetime, date
 import json
-from collections import defaultdict
+from collections import defaultdict, deque
 import requests
 import os
+import zlib
+import base64
+from concurrent.futures import ThreadPoolExecutor
 
 # Page config
 st.set_page_config(page_title="Habit Tracker", page_icon="📅", layout="wide")
@@ -12,6 +15,231 @@ st.set_page_config(page_title="Habit Tracker", page_icon="📅", layout="wide")
 # GitHub Gists configuration (read from Streamlit Secrets or environment)
 GITHUB_TOKEN = st.secrets.get("GITHUB_TOKEN", os.getenv("GITHUB_TOKEN", ""))
 GIST_ID = st.secrets.get("GIST_ID", os.getenv("GIST_ID", ""))
+# Base URL of the Gist API (overridden to point at a mock server in load tests)
+GIST_API_URL = st.secrets.get("GIST_API_URL", os.getenv("GIST_API_URL", "https://api.github.com"))
+# Upload format: "json" (indented, legacy), "compact" or "compact+zlib"
+GIST_FORMATS = ("json", "compact", "compact+zlib")
+GIST_FORMAT = st.secrets.get("GIST_FORMAT", os.getenv("GIST_FORMAT", "json"))
+if GIST_FORMAT not in GIST_FORMATS:
+    st.error(f"Unknown GIST_FORMAT {GIST_FORMAT!r}, expected one of {', '.join(GIST_FORMATS)}; saving as json")
+    GIST_FORMAT = "json"
+# Number of actions that can be undone; older ones are evicted
+UNDO_DEPTH = int(st.secrets.get("UNDO_DEPTH", os.getenv("UNDO_DEPTH", "50")))
+
+# Main data file; extra files named "habit_data.<name>.json" (notes, archives)
+# are fetched alongside it, merged in on load and written back on save
+GIST_FILE = "habit_data.json"
+# Upper bound on concurrent raw file downloads per load
+GIST_MAX_WORKERS = 4
+# Seconds before a Gist request is abandoned
+GIST_TIMEOUT = 10
+
+# Header identifying the compact payload format
+PAYLOAD_FORMAT = "habit-tracker"
+# The legacy indented JSON without a header counts as version 1
+PAYLOAD_VERSION = 2
+
+def encode_counts(counts):
+    """Run-length encode a {"YYYY-MM-DD": count} dict.
+
+    Returns a flat list of [gap, length, count, ...] triples, where gap is the
+    number of days between the end of the previous run and the start of this
+    one (the first gap is the day ordinal itself), or None if the dict has
+    keys or values that would not survive the round trip.
+    """
+    days = []
+    for key, count in counts.items():
+        try:
+            day = datetime.strptime(key, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            return None
+        if day.isoformat() != key or type(count) is not int:
+            return None
+        days.append((day.toordinal(), count))
+    days.sort()
+
+    runs = []
+    prev_end = 0
+    i = 0
+    while i < len(days):
+        start, count = days[i]
+        length = 1
+        while i + length < len(days) and days[i + length] == (start + length, count):
+            length += 1
+        runs.extend([start - prev_end, length, count])
+        prev_end = start + length
+        i += length
+    return runs
+
+def decode_counts(runs):
+    """Expand the run list produced by encode_counts back into a dict"""
+    counts = {}
+    prev_end = 0
+    for i in range(0, len(runs), 3):
+        gap, length, count = runs[i:i + 3]
+        start = prev_end + gap
+        for ordinal in range(start, start + length):
+            counts[date.fromordinal(ordinal).isoformat()] = count
+        prev_end = start + length
+    return counts
+
+def encode_payload(data, fmt=None):
+    """Serialize habit data for upload in the configured GIST_FORMAT"""
+    fmt = fmt or GIST_FORMAT
+    if fmt not in GIST_FORMATS:
+        raise ValueError(f"Unknown GIST_FORMAT {fmt!r}, expected one of {', '.join(GIST_FORMATS)}")
+    if fmt == "json":
+        return json.dumps(data, indent=2)
+
+    encoded = {}
+    for key, value in data.items():
+        runs = None
+        if isinstance(value, dict) and set(value) == {'color', 'count'}:
+            runs = encode_counts(value['count'])
+        encoded[key] = value if runs is None else {'color': value['color'], 'runs': runs}
+
+    doc = {"format": PAYLOAD_FORMAT, "v": PAYLOAD_VERSION, "data": encoded}
+    content = json.dumps(doc, separators=(',', ':'), ensure_ascii=False)
+    if fmt == "compact+zlib":
+        packed = base64.b64encode(zlib.compress(content.encode('utf-8'), 9)).decode('ascii')
+        doc = {"format": PAYLOAD_FORMAT, "v": PAYLOAD_VERSION, "zlib": packed}
+        content = json.dumps(doc, separators=(',', ':'))
+    return content
+
+def decode_payload(content):
+    """Parse gist file content in either the legacy or the compact format"""
+    doc = json.loads(content)
+    if not isinstance(doc, dict) or doc.get("format") != PAYLOAD_FORMAT or "v" not in doc:
+        return doc
+    if not isinstance(doc["v"], int) or doc["v"] > PAYLOAD_VERSION:
+        raise ValueError(f"Unsupported payload version {doc['v']!r}")
+
+    if "zlib" in doc:
+        doc = json.loads(zlib.decompress(base64.b64decode(doc["zlib"])).decode('utf-8'))
+
+    data = {}
+    for key, value in doc["data"].items():
+        if isinstance(value, dict) and set(value) == {'color', 'runs'}:
+            value = {'color': value['color'], 'count': decode_counts(value['runs'])}
+        data[key] = value
+    return data
+
+def get_http_session():
+    """HTTP session kept for the user's session so connections are reused across reruns.
+
+    Each user gets their own session, so the pool only has to cover one
+    load's concurrent downloads rather than every user at once.
+    """
+    if 'http_session' not in st.session_state:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=GIST_MAX_WORKERS)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        st.session_state.http_session = session
+    return st.session_state.http_session
+
+def is_gist_data_file(name):
+    """Whether a gist file holds habit data to be merged on load"""
+    prefix, ext = os.path.splitext(GIST_FILE)
+    return name == GIST_FILE or (name.startswith(prefix + ".") and name.endswith(ext))
+
+def fetch_gist_file(session, file_info, headers):
+    """Return a gist file's content, downloading raw_url when the API truncated it"""
+    if not file_info.get('truncated') and file_info.get('content') is not None:
+        return file_info['content']
+    response = session.get(file_info['raw_url'], headers=headers, timeout=GIST_TIMEOUT)
+    response.raise_for_status()
+    return response.text
+
+def fetch_gist_files(session, files, headers):
+    """Fetch the content of several gist files concurrently.
+
+    Files the API already returned in full are used as is; only truncated
+    ones cost a request, so load time is bounded by the slowest download
+    (at most GIST_TIMEOUT). Returns (contents, errors), both keyed by file name.
+    """
+    pending = [name for name, info in files.items()
+               if info.get('truncated') or info.get('content') is None]
+    contents = {name: info['content'] for name, info in files.items() if name not in pending}
+    errors = {}
+    if pending:
+        with ThreadPoolExecutor(max_workers=min(GIST_MAX_WORKERS, len(pending))) as pool:
+            futures = {name: pool.submit(fetch_gist_file, session, files[name], headers) for name in pending}
+        for name, future in futures.items():
+            try:
+                contents[name] = future.result()
+            except Exception as e:
+                errors[name] = e
+    return contents, errors
+
+def item_key(item):
+    """Hashable form of a list entry (e.g. a note dict) for set membership tests"""
+    return json.dumps(item, sort_keys=True)
+
+def merge_data(data, extra):
+    """Merge data from an extra gist file into data, keeping data on conflicts.
+
+    Returns what the extra file contributed, keyed by top-level key:
+    ('all', None) for a whole value, ('days', set) for habit days, ('keys', set)
+    for other dict entries and ('items', set) of item_key values for list
+    entries. split_data uses this to write those parts back to the extra file
+    on save.
+    """
+    owned = {}
+    for key, value in extra.items():
+        current = data.get(key)
+        if current is None:
+            data[key] = value
+            owned[key] = ('all', None)
+        elif isinstance(current, list) and isinstance(value, list):
+            present = {item_key(item) for item in current}
+            items = set()
+            for item in value:
+                item_id = item_key(item)
+                if item_id not in present:
+                    present.add(item_id)
+                    items.add(item_id)
+                    current.append(item)
+            owned[key] = ('items', items)
+        elif isinstance(current, dict) and isinstance(value, dict) and 'count' in current and 'count' in value:
+            days = {day: count for day, count in value['count'].items() if day not in current['count']}
+            current['count'].update(days)
+            owned[key] = ('days', set(days))
+        elif isinstance(current, dict) and isinstance(value, dict):
+            keys = {sub_key for sub_key in value if sub_key not in current}
+            current.update((sub_key, value[sub_key]) for sub_key in keys)
+            owned[key] = ('keys', keys)
+    return owned
+
+def split_data(data, layout):
+    """Split data back into the main file and the extra files it was merged from.
+
+    Parts go back to the extra file they came from, in load order; anything
+    new goes to the main file. Data deleted since the load is in neither, so
+    deletions stick. data itself is not modified.
+    """
+    main = dict(data)
+    parts = {}
+    for name in sorted(layout):
+        part = parts[name] = {}
+        for key, (kind, owned) in layout[name]['owned'].items():
+            if key not in main:
+                continue
+            value = main[key]
+            if kind == 'all':
+                part[key] = value
+                del main[key]
+            elif kind == 'items' and isinstance(value, list):
+                part[key], main[key] = [], []
+                for item in value:
+                    (part[key] if item_key(item) in owned else main[key]).append(item)
+            elif kind == 'days' and isinstance(value, dict) and 'count' in value:
+                part[key] = {**value, 'count': {day: count for day, count in value['count'].items() if day in owned}}
+                main[key] = {**value, 'count': {day: count for day, count in value['count'].items() if day not in owned}}
+            elif kind == 'keys' and isinstance(value, dict):
+                part[key] = {sub_key: sub_value for sub_key, sub_value in value.items() if sub_key in owned}
+                main[key] = {sub_key: sub_value for sub_key, sub_value in value.items() if sub_key not in owned}
+    return main, parts
 
 def load_from_gist():
     """Load data from GitHub Gist"""
@@ -19,13 +247,36 @@ def load_from_gist():
         return None
     
     try:
+        session = get_http_session()
         headers = {"Authorization": f"token {GITHUB_TOKEN}"}
-        response = requests.get(f"https://api.github.com/gists/{GIST_ID}", headers=headers)
+        response = session.get(f"{GIST_API_URL}/gists/{GIST_ID}", headers=headers, timeout=GIST_TIMEOUT)
         
         if response.status_code == 200:
             gist_data = response.json()
-            content = gist_data['files']['habit_data.json']['content']
-            return json.loads(content)
+            files = {name: info for name, info in gist_data['files'].items() if is_gist_data_file(name)}
+            if GIST_FILE not in files:
+                st.error(f"Gist has no {GIST_FILE} file")
+                return None
+            contents, errors = fetch_gist_files(session, files, headers)
+            if GIST_FILE in errors:
+                raise errors[GIST_FILE]
+            data = decode_payload(contents.pop(GIST_FILE))
+            # Remember which parts came from which extra file so saves can write them back.
+            # A file that fails to load is left out, so saves never touch it.
+            layout = {}
+            for name in sorted(contents):
+                try:
+                    extra = decode_payload(contents[name])
+                    if not isinstance(extra, dict):
+                        raise ValueError("not a JSON object")
+                except Exception as e:
+                    errors[name] = e
+                    continue
+                layout[name] = {'owned': merge_data(data, extra), 'content': contents[name]}
+            for name, error in errors.items():
+                st.warning(f"Skipped {name} from Gist: {error}")
+            st.session_state.gist_layout = layout
+            return data
         else:
             st.error(f"Failed to load from Gist: {response.status_code}")
     except Exception as e:
@@ -40,16 +291,26 @@ def save_to_gist(data):
     
     try:
         headers = {"Authorization": f"token {GITHUB_TOKEN}"}
+        layout = st.session_state.get('gist_layout', {})
+        main, parts = split_data(data, layout)
         payload = {
             "files": {
-                "habit_data.json": {"content": json.dumps(data, indent=2)}
+                GIST_FILE: {"content": encode_payload(main)}
             }
         }
+        # Only rewrite extra files whose share of the data changed
+        for name, part in parts.items():
+            content = encode_payload(part)
+            if content != layout[name]['content']:
+                payload["files"][name] = {"content": content}
         
-        response = requests.patch(f"https://api.github.com/gists/{GIST_ID}", 
-                               json=payload, headers=headers)
+        response = get_http_session().patch(f"{GIST_API_URL}/gists/{GIST_ID}", 
+                                            json=payload, headers=headers, timeout=GIST_TIMEOUT)
         
         if response.status_code == 200:
+            for name in parts:
+                if name in payload["files"]:
+                    layout[name]['content'] = payload["files"][name]["content"]
             return True
         else:
             st.error(f"Failed to save to Gist: {response.status_code}")
@@ -81,6 +342,77 @@ def save_data(data):
         st.session_state.last_save_json = json.dumps(data, indent=2)
         st.session_state.last_save_status = "⚠️ Manual save required - GitHub Gist not available"
 
+# Undo/redo history
+#
+# Each history entry is a (path, old, new, index) delta, where path is a tuple
+# of keys from st.session_state down to the changed value and old/new are ()
+# when the key is absent or (value,) when present. index is the key's position
+# in its dict when the edit deletes it, so undo puts it back in the same place
+# (habit order drives the summary cards, calendar dots and selectboxes).
+# Only references to the replaced values are kept, so an entry costs O(change)
+# rather than a copy of the data. Entries stay consistent as long as every edit
+# goes through apply_edit and they are replayed in stack order.
+
+def get_container(path):
+    """Return the dict or list in session state holding the last key of path"""
+    container = st.session_state
+    for key in path[:-1]:
+        container = container[key]
+    return container
+
+def get_path(path):
+    """Return (value,) at path in session state, or () if it is absent"""
+    container = get_container(path)
+    key = path[-1]
+    if isinstance(container, list):
+        return (container[key],) if key < len(container) else ()
+    return (container[key],) if key in container else ()
+
+def set_path(path, value, index=None):
+    """Set path in session state to value[0], or delete it if value is ()
+
+    When the key is re-added to a dict and index is given, it is inserted at
+    that position instead of at the end.
+    """
+    container = get_container(path)
+    key = path[-1]
+    if not value:
+        del container[key]
+    elif isinstance(container, list) and key == len(container):
+        container.append(value[0])
+    elif isinstance(container, dict) and index is not None and key not in container:
+        items = list(container.items())
+        items.insert(index, (key, value[0]))
+        container.clear()
+        container.update(items)
+    else:
+        container[key] = value[0]
+
+def apply_edit(path, *value):
+    """Set path to value (delete it when no value is given) and record it for undo"""
+    old = get_path(path)
+    container = get_container(path)
+    index = None
+    if not value and old and isinstance(container, dict):
+        index = list(container).index(path[-1])
+    set_path(path, value)
+    st.session_state.undo_stack.append((path, old, value, index))
+    st.session_state.redo_stack.clear()
+
+def undo():
+    """Revert the most recent edit and persist the result"""
+    path, old, new, index = st.session_state.undo_stack.pop()
+    set_path(path, old, index)
+    st.session_state.redo_stack.append((path, old, new, index))
+    save_data(st.session_state.habits)
+
+def redo():
+    """Reapply the most recently undone edit and persist the result"""
+    path, old, new, index = st.session_state.redo_stack.pop()
+    set_path(path, new)
+    st.session_state.undo_stack.append((path, old, new, index))
+    save_data(st.session_state.habits)
+
 # Default data structure
 def get_default_data():
     return {
@@ -132,6 +464,12 @@ if 'last_save_json' not in st.session_state:
 if 'last_save_status' not in st.session_state:
     st.session_state.last_save_status = ""
 
+if 'undo_stack' not in st.session_state:
+    st.session_state.undo_stack = deque(maxlen=UNDO_DEPTH)
+
+if 'redo_stack' not in st.session_state:
+    st.session_state.redo_stack = deque(maxlen=UNDO_DEPTH)
+
 # Custom CSS
 st.markdown("""
 <style>
@@ -300,9 +638,8 @@ with st.sidebar:
     
     if st.button("➕ Add Activity", use_container_width=True):
         date_key = f"{st.session_state.current_year}-{st.session_state.current_month:02d}-{selected_day:02d}"
-        if date_key not in st.session_state.habits[selected_habit]['count']:
-            st.session_state.habits[selected_habit]['count'][date_key] = 0
-        st.session_state.habits[selected_habit]['count'][date_key] += 1
+        count = st.session_state.habits[selected_habit]['count'].get(date_key, 0)
+        apply_edit(('habits', selected_habit, 'count', date_key), count + 1)
         save_data(st.session_state.habits)
         st.success(f"Added {selected_habit}!")
         st.rerun()
@@ -317,10 +654,11 @@ with st.sidebar:
     if st.button("➖ Remove One", use_container_width=True):
         date_key = f"{st.session_state.current_year}-{st.session_state.current_month:02d}-{remove_day:02d}"
         if date_key in st.session_state.habits[remove_habit]['count']:
-            if st.session_state.habits[remove_habit]['count'][date_key] > 1:
-                st.session_state.habits[remove_habit]['count'][date_key] -= 1
+            count = st.session_state.habits[remove_habit]['count'][date_key]
+            if count > 1:
+                apply_edit(('habits', remove_habit, 'count', date_key), count - 1)
             else:
-                del st.session_state.habits[remove_habit]['count'][date_key]
+                apply_edit(('habits', remove_habit, 'count', date_key))
             save_data(st.session_state.habits)
             st.success(f"Removed one {remove_habit}!")
             st.rerun()
@@ -337,7 +675,7 @@ with st.sidebar:
         new_habit_color = st.color_picker("Color", "#9B59B6")
         if st.button("Create Habit", use_container_width=True):
             if new_habit_name and new_habit_name not in st.session_state.habits and new_habit_name != 'notes':
-                st.session_state.habits[new_habit_name] = {'color': new_habit_color, 'count': {}}
+                apply_edit(('habits', new_habit_name), {'color': new_habit_color, 'count': {}})
                 save_data(st.session_state.habits)
                 st.success(f"Added {new_habit_name}!")
                 st.rerun()
@@ -353,14 +691,14 @@ with st.sidebar:
                 new_color = st.color_picker(f"{habit_name}", st.session_state.habits[habit_name]['color'], key=f"color_{habit_name}")
             with col2:
                 if st.button("💾", key=f"save_{habit_name}"):
-                    st.session_state.habits[habit_name]['color'] = new_color
+                    apply_edit(('habits', habit_name, 'color'), new_color)
                     save_data(st.session_state.habits)
                     st.rerun()
     
     with st.expander("🗑️ Delete Habit"):
         delete_habit = st.selectbox("Select habit to delete", [k for k in st.session_state.habits.keys() if k != 'notes'], key="delete_select")
         if st.button("Delete", use_container_width=True, type="primary"):
-            del st.session_state.habits[delete_habit]
+            apply_edit(('habits', delete_habit))
             save_data(st.session_state.habits)
             st.success(f"Deleted {delete_habit}!")
             st.rerun()
@@ -370,6 +708,16 @@ with st.sidebar:
     # Data management
     st.subheader("📦 Data Management")
     
+    undo_col, redo_col = st.columns(2)
+    with undo_col:
+        if st.button("↩️ Undo", use_container_width=True, disabled=not st.session_state.undo_stack):
+            undo()
+            st.rerun()
+    with redo_col:
+        if st.button("↪️ Redo", use_container_width=True, disabled=not st.session_state.redo_stack):
+            redo()
+            st.rerun()
+    
     # GitHub Gists sync
     with st.expander("☁️ GitHub Gists Sync"):
         # Check if credentials are available
@@ -381,7 +729,7 @@ with st.sidebar:
             
             if st.button("🔄 Load from Gist", use_container_width=True):
                 loaded_data = load_data()
-                st.session_state.habits = loaded_data
+                apply_edit(('habits',), loaded_data)
                 st.success("Loaded from GitHub Gist!")
                 st.rerun()
             
@@ -434,10 +782,12 @@ with st.sidebar:
     )
     
     uploaded_file = st.file_uploader("📁 Upload Backup", type=['json'])
-    if uploaded_file is not None:
+    # The uploader keeps returning the file on every rerun; only restore it once
+    if uploaded_file is not None and uploaded_file.file_id != st.session_state.get('restored_file_id'):
         try:
-            uploaded_data = json.load(uploaded_file)
-            st.session_state.habits = uploaded_data
+            uploaded_data = decode_payload(uploaded_file.read())
+            st.session_state.restored_file_id = uploaded_file.file_id
+            apply_edit(('habits',), uploaded_data)
             save_data(st.session_state.habits)
             st.success("Data restored successfully!")
             st.rerun()
@@ -550,7 +900,7 @@ with st.form("add_journal_entry"):
     submitted = st.form_submit_button("Add Entry")
 
     if submitted and new_text.strip():
-        st.session_state.habits["notes"].append({
+        apply_edit(('habits', 'notes', len(st.session_state.habits["notes"])), {
             "date": chosen_date.strftime("%Y-%m-%d"),   # store sortable format
             "text": new_text.strip()
         })
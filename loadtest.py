@@ -0,0 +1,362 @@
+"""Load test for the Habit Tracker app.
+
+Drives N concurrent headless sessions of app.py through Streamlit's AppTest
+against a local mock of the GitHub Gist API, then reports rerun latency,
+requests made to the backend and memory held per session.
+
+AppTest keeps a process-wide runtime, so each simulated user runs in its own
+worker process; the mock server runs in the parent and sees all of them.
+
+    python loadtest.py --users 20 --actions 30 --latency-ms 50 --years 5 --format compact
+"""
+import argparse
+import json
+import random
+import resource
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from streamlit.testing.v1 import AppTest
+
+APP_PATH = str(Path(__file__).with_name("app.py"))
+GIST_ID = "loadtest"
+GIST_FILE = "habit_data.json"
+ARCHIVE_FILE = "habit_data.archive.json"
+NOTES_FILE = "habit_data.notes.json"
+HABITS = {'Tennis': '#FF6B6B', 'DSA Solving': '#4ECDC4', 'Finance Learning': '#FFE66D'}
+
+class MockGistServer(ThreadingHTTPServer):
+    """In-memory stand-in for the parts of the Gist API the app uses"""
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, truncate_over=None, files=None):
+        super().__init__(("127.0.0.1", 0), MockGistHandler)
+        self.latency = latency
+        # Report files larger than this as truncated, like the real API does
+        self.truncate_over = truncate_over
+        self.files = dict(files) if files else {GIST_FILE: json.dumps({})}
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def gist_listing(self):
+        files = {}
+        for name, content in self.files.items():
+            truncated = self.truncate_over is not None and len(content) > self.truncate_over
+            files[name] = {
+                "filename": name,
+                "size": len(content),
+                "truncated": truncated,
+                "content": content[:self.truncate_over] if truncated else content,
+                "raw_url": f"{self.url}/raw/{GIST_ID}/{name}",
+            }
+        return {"id": GIST_ID, "files": files}
+
+class MockGistHandler(BaseHTTPRequestHandler):
+    # Keep connections alive like the real API so client connection reuse shows up
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body, content_type="application/json"):
+        data = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        with self.server.lock:
+            self.server.bytes_out += len(data)
+
+    def record(self, kind):
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.requests[f"{self.command} {kind}"] += 1
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if parts[:2] == ["gists", GIST_ID]:
+            self.record("gist")
+            with self.server.lock:
+                listing = self.server.gist_listing()
+            self.reply(200, json.dumps(listing))
+        elif parts[:2] == ["raw", GIST_ID] and len(parts) == 3 and parts[2] in self.server.files:
+            self.record("raw")
+            self.reply(200, self.server.files[parts[2]], "text/plain")
+        else:
+            self.record("unknown")
+            self.reply(404, json.dumps({"message": "Not Found"}))
+
+    def do_PATCH(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.lock:
+            self.server.bytes_in += len(body)
+        if self.path.strip("/").split("/") != ["gists", GIST_ID]:
+            self.record("unknown")
+            self.reply(404, json.dumps({"message": "Not Found"}))
+            return
+        self.record("gist")
+        files = json.loads(body)["files"]
+        with self.server.lock:
+            for name, file in files.items():
+                self.server.files[name] = file["content"]
+            listing = self.server.gist_listing()
+        self.reply(200, json.dumps(listing))
+
+def synthetic_gist(years, seed):
+    """Gist files holding `years` years of activity and journal notes.
+
+    The current year's counts go in the main file, earlier years in an
+    archive file and all notes in a notes file, so loads exercise the
+    multi-file merge.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    archive_before = date(today.year, 1, 1)
+    main = {name: {'color': color, 'count': {}} for name, color in HABITS.items()}
+    archive = {name: {'color': color, 'count': {}} for name, color in HABITS.items()}
+    notes = []
+    day = today - timedelta(days=round(365.25 * years))
+    while day <= today:
+        key = day.isoformat()
+        for name in HABITS:
+            if rng.random() < 0.6:
+                (archive if day < archive_before else main)[name]['count'][key] = rng.choice([1, 1, 1, 2, 3])
+        if rng.random() < 0.15:
+            notes.append({'date': key, 'text': f"Synthetic note for {key}"})
+        day += timedelta(days=1)
+    main['notes'] = []
+    return {
+        GIST_FILE: json.dumps(main, indent=2),
+        ARCHIVE_FILE: json.dumps(archive, indent=2),
+        NOTES_FILE: json.dumps({'notes': notes}, indent=2),
+    }
+
+def convert_gist(secrets, timeout):
+    """Load the seeded gist and save it back so its files use the app's GIST_FORMAT"""
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.secrets.update(secrets)
+    at.run()
+    button(at, "💾 Save to Gist").click()
+    at.run()
+    return [message.value for message in [*at.exception, *at.error, *at.warning]]
+
+def deep_size(obj, seen=None):
+    """Approximate memory held by obj and everything it references"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)) or type(obj).__name__ == "deque":
+        size += sum(deep_size(item, seen) for item in obj)
+    return size
+
+def button(at, label):
+    return next(b for b in at.button if b.label == label)
+
+def add_activity(at, rng):
+    button(at, "➕ Add Activity").click()
+
+def next_month(at, rng):
+    button(at, "▶").click()
+
+def previous_month(at, rng):
+    button(at, "◀").click()
+
+def add_note(at, rng):
+    at.text_area[0].input(f"Load test note {rng.random():.6f}")
+    button(at, "Add Entry").click()
+
+ACTIONS = {
+    "add_activity": (add_activity, 5),
+    "next_month": (next_month, 2),
+    "previous_month": (previous_month, 2),
+    "add_note": (add_note, 1),
+}
+
+def simulate_user(user, secrets, actions, timeout, seed):
+    """Run one session: initial load followed by a sequence of random clicks"""
+    rng = random.Random(seed + user)
+    names = list(ACTIONS)
+    weights = [ACTIONS[name][1] for name in names]
+    timings = defaultdict(list)
+    timeouts = Counter()
+    errors = []
+
+    def timed_run(at, name, collect_messages=True):
+        # The app reports backend failures with st.error/st.warning, and saves
+        # are followed by st.rerun(), which discards messages from that run.
+        # Clearing the save status means a failed save during this rerun shows
+        # up as the status warning it renders afterwards.
+        at.session_state["last_save_status"] = ""
+        start = time.perf_counter()
+        try:
+            at.run()
+        except RuntimeError as e:
+            # AppTest raises RuntimeError when a rerun exceeds its timeout
+            timeouts[name] += 1
+            errors.append(f"{name}: {e}")
+            return
+        timings[name].append(time.perf_counter() - start)
+        if at.exception:
+            errors.append(f"{name}: {at.exception[0].message}")
+        if collect_messages:
+            errors.extend(f"{name}: {message.value}" for message in [*at.error, *at.warning])
+
+    # The first run in a fresh worker pays for imports and starting the
+    # Streamlit runtime. Time it separately, with Gist sync off so it makes no
+    # backend requests, so that initial_load only measures a session start.
+    warmup = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    warmup.secrets["GIST_ID"] = ""
+    # Sync is off on purpose here, so its "credentials not found" warning is expected
+    timed_run(warmup, "cold_start", collect_messages=False)
+
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.secrets.update(secrets)
+    timed_run(at, "initial_load")
+
+    for _ in range(actions):
+        name = rng.choices(names, weights)[0]
+        try:
+            ACTIONS[name][0](at, rng)
+        except StopIteration:
+            errors.append(f"{name}: widget not rendered")
+            continue
+        timed_run(at, name)
+
+    # ru_maxrss is in KiB on Linux
+    rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) * 1024
+    return dict(timings), timeouts, deep_size(at.session_state.to_dict()), rss_growth, errors
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+def report(timings, timeouts, server, seeded_sizes, session_sizes, rss_growths, errors, users, elapsed):
+    """Print latency, backend and memory figures for the run"""
+    print(f"\n{users} users, {elapsed:.1f}s wall time")
+    print("\ngist files at start:")
+    for name, size in seeded_sizes.items():
+        print(f"  {name:<26}{size / 1024:>9.1f} KiB")
+    print(f"\n{'rerun':<16}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'timeouts':>10}")
+
+    def row(name, values, timed_out):
+        if values:
+            print(f"{name:<16}{len(values):>7}{percentile(values, 50) * 1000:>10.1f}"
+                  f"{percentile(values, 95) * 1000:>10.1f}{max(values) * 1000:>10.1f}{timed_out:>10}")
+        elif timed_out:
+            print(f"{name:<16}{0:>7}{'-':>10}{'-':>10}{'-':>10}{timed_out:>10}")
+
+    # Process cold start is reported on its own and kept out of the totals
+    row("cold_start", timings.get("cold_start"), timeouts["cold_start"])
+    everything = []
+    for name in ["initial_load", *ACTIONS]:
+        everything.extend(timings.get(name, []))
+        row(name, timings.get(name), timeouts[name])
+    row("all", everything, sum(count for name, count in timeouts.items() if name != "cold_start"))
+
+    total = sum(server.requests.values())
+    print(f"\nbackend requests: {total} ({total / users:.1f} per session, {total / elapsed:.1f}/s)")
+    for kind, count in sorted(server.requests.items()):
+        print(f"  {kind:<14}{count:>7}")
+    print(f"  uploaded      {server.bytes_in / 1024:>7.1f} KiB")
+    print(f"  downloaded    {server.bytes_out / 1024:>7.1f} KiB")
+
+    if session_sizes:
+        print(f"\nsession state: {statistics.mean(session_sizes) / 1024:.1f} KiB mean, "
+              f"{max(session_sizes) / 1024:.1f} KiB max per session")
+        print(f"peak RSS growth after warm-up: {statistics.mean(rss_growths) / 2**20:.1f} MiB mean, "
+              f"{max(rss_growths) / 2**20:.1f} MiB max per session")
+
+    if errors:
+        print(f"\n{len(errors)} errors and warnings, most common:")
+        for message, count in Counter(errors).most_common(5):
+            print(f"  {count:>5}  {message}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10, help="concurrent simulated sessions")
+    parser.add_argument("--actions", type=int, default=20, help="clicks per session after the initial load")
+    parser.add_argument("--latency-ms", type=float, default=0, help="delay added to every mock Gist response")
+    parser.add_argument("--format", default="json", choices=("json", "compact", "compact+zlib"),
+                        help="GIST_FORMAT used by the app")
+    parser.add_argument("--years", type=int, default=3,
+                        help="years of synthetic data to seed the gist with (0 for an empty gist)")
+    parser.add_argument("--truncate-over", type=int, default=None,
+                        help="report gist files larger than this many bytes as truncated, "
+                             "so they are downloaded from raw_url")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds allowed per rerun")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    files = synthetic_gist(args.years, args.seed) if args.years > 0 else None
+    server = MockGistServer(args.latency_ms / 1000, args.truncate_over, files)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # All sessions share one gist, as they do in a real deployment
+    secrets = {
+        "GITHUB_TOKEN": "loadtest-token",
+        "GIST_ID": GIST_ID,
+        "GIST_API_URL": server.url,
+        "GIST_FORMAT": args.format,
+    }
+
+    timings = defaultdict(list)
+    timeouts = Counter()
+    session_sizes = []
+    rss_growths = []
+    errors = []
+    try:
+        if files and args.format != "json":
+            # The seed is legacy JSON; have the app rewrite it in the chosen format
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                try:
+                    errors.extend(f"seeding: {message}" for message in
+                                  pool.submit(convert_gist, secrets, args.timeout).result())
+                except Exception as e:
+                    errors.append(f"seeding aborted: {e!r}")
+        with server.lock:
+            seeded_sizes = {name: len(content.encode("utf-8")) for name, content in server.files.items()}
+            server.requests.clear()
+            server.bytes_in = server.bytes_out = 0
+
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=args.users) as pool:
+            futures = [pool.submit(simulate_user, user, secrets, args.actions, args.timeout, args.seed)
+                       for user in range(args.users)]
+            for user, future in enumerate(futures):
+                try:
+                    user_timings, user_timeouts, size, rss_growth, user_errors = future.result()
+                except Exception as e:
+                    errors.append(f"user {user} aborted: {e!r}")
+                    continue
+                for name, values in user_timings.items():
+                    timings[name].extend(values)
+                timeouts.update(user_timeouts)
+                session_sizes.append(size)
+                rss_growths.append(rss_growth)
+                errors.extend(user_errors)
+    finally:
+        server.shutdown()
+    elapsed = time.perf_counter() - start
+
+    report(timings, timeouts, server, seeded_sizes, session_sizes, rss_growths, errors, args.users, elapsed)
+
+if __name__ == "__main__":
+    main()